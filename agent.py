@@ -6,53 +6,229 @@ Multi-agent system providing guidance on academics, internships, networking, and
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import tool
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_groq import ChatGroq
 from langchain_community.tools.tavily_search import TavilySearchResults
-from datetime import datetime, timedelta
+from langchain_community.utilities.tavily_search import TAVILY_API_URL, TavilySearchAPIWrapper
+from cachetools import TTLCache
+from datetime import datetime, timedelta, timezone
+from collections import deque
+from typing import AsyncIterator, Iterator
+import asyncio
+import concurrent.futures
+import functools
+import logging
 import os
+import queue
+import re
 import sys
+import threading
+import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
-import json
+from semantic_cache import SemanticCache
+import cache_store
+
+try:
+    import diskcache
+except ImportError:
+    # Optional dependency: without it every search goes to the network
+    diskcache = None
 
 load_dotenv()
 
-# Global chat history
-chat_history = []
+# Per-step agent logging (AGENT_VERBOSE=1) and LangSmith tracing
+# (LANGCHAIN_TRACING_V2=true) both run blocking callbacks on every LLM/tool
+# step, so they stay off unless explicitly enabled for debugging
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "0") == "1"
+os.environ.setdefault("LANGCHAIN_TRACING_V2", "false")
+# The Groq client logs every HTTP request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Global chat history: the last 10 exchanges (20 messages), kept as ready-made
+# message objects so nothing is re-wrapped per turn; the deque evicts the oldest
+chat_history = deque(maxlen=20)
+
+# Answers keyed by question meaning: a paraphrase of an earlier question
+# ("how do I find an internship?" / "help me get an internship") reuses the
+# earlier answer instead of another LLM + Tavily round trip. Entries are kept
+# on disk for a day, so restarts and other worker processes start warm.
+response_cache = SemanticCache(threshold=0.92, ttl=24 * 60 * 60, store=cache_store.store)
+
+# =============================================================================
+# TOOL OUTPUT CACHE
+# =============================================================================
+
+# Formatted output of the Tavily-backed tools, keyed on normalized arguments.
+# Search results barely change within a day, so repeat calls skip the network.
+# Only outputs that include live results are stored; a failed search (which
+# TavilySearchResults reports as an error string) is retried next time.
+# Static tools are plain dict lookups and get_current_datetime is time-varying,
+# so neither goes through this cache.
+_TOOL_CACHE = TTLCache(maxsize=512, ttl=24 * 60 * 60)
+_TOOL_CACHE_LOCK = threading.Lock()
+
+def _tool_cache_key(tool_name: str, *args) -> tuple:
+    return (tool_name,) + tuple(str(arg).lower().strip() for arg in args)
+
+def _tool_cache_get(key: tuple):
+    with _TOOL_CACHE_LOCK:
+        return _TOOL_CACHE.get(key)
+
+def _tool_cache_put(key: tuple, output: str):
+    with _TOOL_CACHE_LOCK:
+        _TOOL_CACHE[key] = output
+
+def _format_results(results, n: int, default_title: str, width: int, line_fmt: str) -> list[str]:
+    """
+    Format the first `n` search results with `line_fmt` (fields: i, title,
+    snippet, url), cutting snippets at `width` characters. Tavily returns
+    list[dict]; anything else (e.g. an error string) gives no lines.
+    """
+    try:
+        return [
+            line_fmt.format(i=i, title=result.get('title', default_title),
+                            snippet=result.get('content', '')[:width], url=result.get('url', ''))
+            for i, result in enumerate(results[:n], 1)
+        ]
+    except (TypeError, AttributeError):
+        return []
+
+def _search_tool_output(cache_key: tuple, parts: list[str], found: list[str]) -> str:
+    """Join a search tool's output, caching it only if it includes live results."""
+    output = "".join(parts)
+    if found:
+        _tool_cache_put(cache_key, output)
+    return output
+
+# =============================================================================
+# SHARED SEARCH CLIENT
+# =============================================================================
+
+# Raw Tavily responses on disk, keyed on the full request (query + options).
+# Unlike the in-process caches above this survives restarts and is shared by
+# every worker process, so a query another user already made skips the
+# network round trip entirely. Entries expire after a day; the directory is
+# capped at 200 MB (least recently used entries are culled first).
+_SEARCH_CACHE_TTL = 24 * 60 * 60
+_SEARCH_CACHE = None
+if diskcache is not None:
+    try:
+        _SEARCH_CACHE = diskcache.Cache(
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tavily_cache"),
+            size_limit=200 * 1024 * 1024,
+            eviction_policy="least-recently-used"
+        )
+    except Exception as e:
+        # e.g. a read-only app directory or a locked/corrupt database: search uncached
+        print(f"Search cache disabled ({e})")
+
+
+# One keep-alive connection pool for every Tavily request. The stock wrapper
+# opens a fresh connection (and TLS handshake) per search; with a shared
+# session, repeat and parallel searches reuse warm sockets.
+_SEARCH_SESSION = requests.Session()
+_SEARCH_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+_SEARCH_TIMEOUT = (5, 30)  # (connect, read) seconds
+
+
+class _CachedTavilyAPIWrapper(TavilySearchAPIWrapper):
+    """Tavily API wrapper with pooled connections and a disk cache of responses."""
+
+    def raw_results(
+        self,
+        query,
+        max_results=5,
+        search_depth="advanced",
+        include_domains=None,
+        exclude_domains=None,
+        include_answer=False,
+        include_raw_content=False,
+        include_images=False,
+    ):
+        params = {
+            "query": query,
+            "max_results": max_results,
+            "search_depth": search_depth,
+            "include_domains": include_domains or [],
+            "exclude_domains": exclude_domains or [],
+            "include_answer": include_answer,
+            "include_raw_content": include_raw_content,
+            "include_images": include_images,
+        }
+        key = repr(sorted(params.items()))
+        if _SEARCH_CACHE is not None:
+            results = _SEARCH_CACHE.get(key)
+            if results is not None:
+                return results
+
+        response = _SEARCH_SESSION.post(
+            f"{TAVILY_API_URL}/search",
+            json={**params, "api_key": self.tavily_api_key.get_secret_value()},
+            # requests waits forever by default; a stalled socket would hang the turn
+            timeout=_SEARCH_TIMEOUT
+        )
+        response.raise_for_status()
+        results = response.json()
+
+        if _SEARCH_CACHE is not None:
+            _SEARCH_CACHE.set(key, results, expire=_SEARCH_CACHE_TTL)
+        return results
+
+    async def raw_results_async(self, *args, **kwargs):
+        # The session is blocking, so run it in a worker thread: the event loop
+        # stays free and parallel tool calls share the same connection pool
+        return await asyncio.to_thread(self.raw_results, *args, **kwargs)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_tavily(max_results: int, search_depth: str = "basic") -> TavilySearchResults:
+    """
+    Return the shared Tavily tool for a given result count and search depth.
+    Built on first use (the constructor needs TAVILY_API_KEY) and reused after,
+    so every search goes through the same configured client.
+
+    "basic" is about twice as fast as "advanced" and plenty for the short
+    snippets the tools display. Tavily's generated answer is never shown, so
+    include_answer stays off to skip its extra summarization step.
+    """
+    return TavilySearchResults(
+        max_results=max_results,
+        search_depth=search_depth,
+        include_answer=False,
+        include_raw_content=False,
+        api_wrapper=_CachedTavilyAPIWrapper()
+    )
 
 # =============================================================================
 # SPECIALIZED AGENTS TOOLS
 # =============================================================================
 
+# Resolved once at import; IST has no DST, so a fixed offset is an exact fallback
+# when zoneinfo or its tz database is unavailable
+try:
+    from zoneinfo import ZoneInfo
+    _IST = ZoneInfo("Asia/Kolkata")
+except (ImportError, KeyError):
+    _IST = timezone(timedelta(hours=5, minutes=30))
+
+_IST_FORMAT = "%Y-%m-%d %H:%M:%S (IST)"
+
 @tool
 def get_current_datetime() -> str:
     """
     Use this tool when the user asks what time or date it is.
     Returns current date & time in Indian Standard Time (IST).
     """
-    try:
-        from zoneinfo import ZoneInfo
-        now = datetime.now(ZoneInfo("Asia/Kolkata"))
-    except ImportError:
-        now = datetime.utcnow() + timedelta(hours=5, minutes=30)
-    return now.strftime("%Y-%m-%d %H:%M:%S (IST)")
+    return datetime.now(_IST).strftime(_IST_FORMAT)
 
 # =============================================================================
 # LIFE EVENTS AGENT TOOLS
 # =============================================================================
 
-@tool
-def get_college_deadlines(event_type: str) -> str:
-    """
-    Use this tool when the user asks about college deadlines, important dates,
-    academic calendar, or timelines for: admission, scholarship, exam, internship,
-    or assignment submission.
-
-    Args:
-        event_type: One of - admission, scholarship, exam, internship, assignment
-    """
-    deadlines = {
-        "admission": """
+# Complete tool output per event type, built once at import
+_COLLEGE_DEADLINES = {
+    "admission": """
 📅 ADMISSION DEADLINES:
 • College Applications: November - January
 • Document Verification: Within 7 days of admission
@@ -65,7 +241,7 @@ def get_college_deadlines(event_type: str) -> str:
 - Set reminders 1 week before deadlines
 - Follow up with admission office regularly
 """,
-        "scholarship": """
+    "scholarship": """
 💰 SCHOLARSHIP DEADLINES:
 • National Scholarship Portal: October - November
 • Merit-based Scholarships: August - September
@@ -80,7 +256,7 @@ def get_college_deadlines(event_type: str) -> str:
 - Bank account details
 - Aadhaar card
 """,
-        "exam": """
+    "exam": """
 📚 EXAM PREPARATION TIMELINE:
 • Mid-semester Exams: 6-8 weeks into semester
 • End-semester Exams: Last month of semester
@@ -93,7 +269,7 @@ def get_college_deadlines(event_type: str) -> str:
 - Revise and practice 3-4 days before
 - Don't skip sleep before exams
 """,
-        "internship": """
+    "internship": """
 💼 INTERNSHIP TIMELINE:
 • Summer Internships: Applications in Jan-March
 • Winter Internships: Applications in Aug-Sept
@@ -106,7 +282,7 @@ def get_college_deadlines(event_type: str) -> str:
 - Start applying 3 months before summer/winter
 - Practice common interview questions
 """,
-        "assignment": """
+    "assignment": """
 📝 ASSIGNMENT MANAGEMENT:
 • Weekly Assignments: Submit within 7 days
 • Monthly Projects: Plan 2 weeks in advance
@@ -119,14 +295,9 @@ def get_college_deadlines(event_type: str) -> str:
 - Keep backups of all work
 - Ask doubts before last day
 """
-    }
-
-    event_lower = event_type.lower()
-    for key in deadlines:
-        if key in event_lower:
-            return deadlines[key]
+}
 
-    return """
+_GENERAL_CALENDAR = """
 📅 GENERAL ACADEMIC CALENDAR:
 • Semester Start: July/August & January
 • Mid-term Break: October & March
@@ -142,18 +313,28 @@ def get_college_deadlines(event_type: str) -> str:
 """
 
 @tool
-def explain_college_process(process_name: str) -> str:
+def get_college_deadlines(event_type: str) -> str:
     """
-    Use this tool when the user asks HOW to do something college-related:
-    course registration, hostel allocation, library membership, attendance tracking,
-    understanding grades or CGPA, fee payment, ID card, or certificates.
+    Use this tool when the user asks about college deadlines, important dates,
+    academic calendar, or timelines for: admission, scholarship, exam, internship,
+    or assignment submission.
 
     Args:
-        process_name: The college process to explain. Examples: registration,
-                      hostel, library, attendance, grades, fees, id card, certificate
+        event_type: One of - admission, scholarship, exam, internship, assignment
     """
-    processes = {
-        "registration": """
+    event_lower = event_type.lower().strip()
+    if event_lower in _COLLEGE_DEADLINES:
+        return _COLLEGE_DEADLINES[event_lower]
+
+    # Free-form input like "exam dates" falls back to a keyword scan
+    for key, deadlines in _COLLEGE_DEADLINES.items():
+        if key in event_lower:
+            return deadlines
+
+    return _GENERAL_CALENDAR
+
+_COLLEGE_PROCESSES = {
+    "registration": """
 📋 COURSE REGISTRATION PROCESS:
 
 Step 1: Check Eligible Courses
@@ -185,7 +366,7 @@ Step 4: Attend Classes
 - Overloading credits
 - Forgetting to pay fees on time
 """,
-        "hostel": """
+    "hostel": """
 🏠 HOSTEL ALLOCATION PROCESS:
 
 Step 1: Application
@@ -218,7 +399,7 @@ Step 4: Settling In
 - Maintenance department
 - Fellow hostel mates
 """,
-        "library": """
+    "library": """
 📚 LIBRARY SYSTEM GUIDE:
 
 Step 1: Get Library Card
@@ -251,7 +432,7 @@ Step 4: Digital Resources
 - Use study rooms for group work
 - Ask librarian for research help
 """,
-        "attendance": """
+    "attendance": """
 ✅ ATTENDANCE MANAGEMENT:
 
 Understanding Rules:
@@ -285,7 +466,7 @@ If Attendance is Low:
 - Affects internal marks
 - Can delay graduation
 """,
-        "grades": """
+    "grades": """
 📊 GRADING SYSTEM EXPLAINED:
 
 Grade Scale (Common System):
@@ -323,14 +504,9 @@ Understanding Components:
 - Clear doubts regularly
 - Practice previous year papers
 """
-    }
+}
 
-    process_lower = process_name.lower()
-    for key in processes:
-        if key in process_lower:
-            return processes[key]
-
-    return """
+_COLLEGE_PROCESS_MENU = """
 🎓 COMMON COLLEGE PROCESSES:
 
 I can help explain:
@@ -347,35 +523,29 @@ I can help explain:
 Please specify which process you'd like to learn about!
 """
 
-# =============================================================================
-# OPPORTUNITY DISCOVERY AGENT TOOLS
-# =============================================================================
-
 @tool
-def search_internships(field: str, year: str, location: str = "India") -> str:
+def explain_college_process(process_name: str) -> str:
     """
-    Use this tool when the user asks about internships, work experience,
-    summer/winter placements, or job opportunities as a student.
+    Use this tool when the user asks HOW to do something college-related:
+    course registration, hostel allocation, library membership, attendance tracking,
+    understanding grades or CGPA, fee payment, ID card, or certificates.
 
     Args:
-        field: Field of study e.g. computer science, engineering, business, design
-        year: Year of study e.g. 1st year, 2nd year, 3rd year, 4th year
-        location: Preferred location (default: India)
+        process_name: The college process to explain. Examples: registration,
+                      hostel, library, attendance, grades, fees, id card, certificate
     """
-    try:
-        query = f"internship opportunities for {year} {field} students in {location} 2025"
+    process_lower = process_name.lower()
+    for key, explanation in _COLLEGE_PROCESSES.items():
+        if key in process_lower:
+            return explanation
 
-        tavily_tool = TavilySearchResults(
-            max_results=5,
-            search_depth="advanced",
-            include_answer=True,
-            include_raw_content=False
-        )
+    return _COLLEGE_PROCESS_MENU
 
-        results = tavily_tool.invoke({"query": query})
+# =============================================================================
+# OPPORTUNITY DISCOVERY AGENT TOOLS
+# =============================================================================
 
-        base_info = f"""
-💼 INTERNSHIP OPPORTUNITIES FOR {field.upper()} - {year}
+_INTERNSHIP_PLATFORMS = """
 
 🌐 Top Platforms to Find Internships:
 1. Internshala (internshala.com) - Most popular in India
@@ -394,16 +564,7 @@ def search_internships(field: str, year: str, location: str = "India") -> str:
 
 """
 
-        if results and isinstance(results, list):
-            base_info += "\n🔍 Latest Opportunities Found:\n\n"
-            for i, result in enumerate(results[:3], 1):
-                if isinstance(result, dict):
-                    title = result.get('title', 'Opportunity')
-                    content = result.get('content', '')
-                    url = result.get('url', '')
-                    base_info += f"{i}. {title}\n   {content[:150]}...\n   Apply: {url}\n\n"
-
-        base_info += """
+_INTERNSHIP_TIPS = """
 ✅ Application Tips:
 • Start applying 3 months before summer/winter break
 • Customize resume for each application
@@ -419,7 +580,40 @@ def search_internships(field: str, year: str, location: str = "India") -> str:
 - Previous internship certificates
 """
 
-        return base_info
+@tool
+async def search_internships(field: str, year: str, location: str = "India") -> str:
+    """
+    Use this tool when the user asks about internships, work experience,
+    summer/winter placements, or job opportunities as a student.
+
+    Args:
+        field: Field of study e.g. computer science, engineering, business, design
+        year: Year of study e.g. 1st year, 2nd year, 3rd year, 4th year
+        location: Preferred location (default: India)
+    """
+    cache_key = _tool_cache_key("search_internships", field, year, location)
+    cached = _tool_cache_get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        query = f"internship opportunities for {year} {field} students in {location} 2025"
+
+        tavily_tool = _get_tavily(3)
+
+        results = await tavily_tool.ainvoke({"query": query})
+
+        parts = [f"\n💼 INTERNSHIP OPPORTUNITIES FOR {field.upper()} - {year}", _INTERNSHIP_PLATFORMS]
+
+        found = _format_results(results, 3, "Opportunity", 150, "{i}. {title}\n   {snippet}...\n   Apply: {url}\n\n")
+
+        if found:
+            parts.append("\n🔍 Latest Opportunities Found:\n\n")
+            parts.extend(found)
+
+        parts.append(_INTERNSHIP_TIPS)
+
+        return _search_tool_output(cache_key, parts, found)
 
     except Exception as e:
         return f"""
@@ -440,29 +634,7 @@ def search_internships(field: str, year: str, location: str = "India") -> str:
 Error accessing live data: {str(e)}
 """
 
-@tool
-def find_scholarships(category: str, state: str = "India") -> str:
-    """
-    Use this tool when the user asks about scholarships, financial aid,
-    stipends, fee waivers, or money to support their education.
-
-    Args:
-        category: Student category e.g. general, sc, st, obc, minority, merit, need-based
-        state: State name for state-specific scholarships (default: India)
-    """
-    try:
-        query = f"{category} scholarships for college students {state} 2025 how to apply"
-
-        tavily_tool = TavilySearchResults(
-            max_results=5,
-            search_depth="advanced",
-            include_answer=True
-        )
-
-        results = tavily_tool.invoke({"query": query})
-
-        base_info = f"""
-💰 SCHOLARSHIP OPPORTUNITIES - {category.upper()}
+_SCHOLARSHIP_PORTALS = """
 
 🎯 Major Scholarship Portals:
 1. National Scholarship Portal (scholarships.gov.in)
@@ -486,16 +658,7 @@ def find_scholarships(category: str, state: str = "India") -> str:
 
 """
 
-        if results and isinstance(results, list):
-            base_info += "\n🔍 Current Scholarship Programs:\n\n"
-            for i, result in enumerate(results[:3], 1):
-                if isinstance(result, dict):
-                    title = result.get('title', 'Scholarship')
-                    content = result.get('content', '')
-                    url = result.get('url', '')
-                    base_info += f"{i}. {title}\n   {content[:150]}...\n   Link: {url}\n\n"
-
-        base_info += """
+_SCHOLARSHIP_GUIDE = """
 📋 Common Required Documents:
 ✓ Income certificate (< 6 months old)
 ✓ Caste certificate (if applicable)
@@ -519,7 +682,39 @@ def find_scholarships(category: str, state: str = "India") -> str:
 • Apply to multiple scholarships
 """
 
-        return base_info
+@tool
+async def find_scholarships(category: str, state: str = "India") -> str:
+    """
+    Use this tool when the user asks about scholarships, financial aid,
+    stipends, fee waivers, or money to support their education.
+
+    Args:
+        category: Student category e.g. general, sc, st, obc, minority, merit, need-based
+        state: State name for state-specific scholarships (default: India)
+    """
+    cache_key = _tool_cache_key("find_scholarships", category, state)
+    cached = _tool_cache_get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        query = f"{category} scholarships for college students {state} 2025 how to apply"
+
+        tavily_tool = _get_tavily(3)
+
+        results = await tavily_tool.ainvoke({"query": query})
+
+        parts = [f"\n💰 SCHOLARSHIP OPPORTUNITIES - {category.upper()}", _SCHOLARSHIP_PORTALS]
+
+        found = _format_results(results, 3, "Scholarship", 150, "{i}. {title}\n   {snippet}...\n   Link: {url}\n\n")
+
+        if found:
+            parts.append("\n🔍 Current Scholarship Programs:\n\n")
+            parts.extend(found)
+
+        parts.append(_SCHOLARSHIP_GUIDE)
+
+        return _search_tool_output(cache_key, parts, found)
 
     except Exception as e:
         return f"""
@@ -541,30 +736,8 @@ def find_scholarships(category: str, state: str = "India") -> str:
 Error accessing live data: {str(e)}
 """
 
-@tool
-def networking_opportunities(interest: str) -> str:
-    """
-    Use this tool when the user asks about networking, building professional
-    connections, finding communities, attending events, or meeting people in their field.
-
-    Args:
-        interest: Area of interest e.g. tech, business, design, research, finance
-    """
-    opportunities = f"""
-🤝 NETWORKING OPPORTUNITIES - {interest.upper()}
-
-📱 Online Communities to Join:
-
-LinkedIn Groups:
-• {interest} Professionals India
-• College to Corporate
-• First-Generation Professionals
-• Young Professionals Network
-
-WhatsApp/Telegram Communities:
-• College alumni groups
-• {interest} enthusiasts groups
-• Industry-specific channels
+# Everything after the interest-specific communities is the same for every call
+_NETWORKING_GUIDE = """• Industry-specific channels
 • Startup networking groups
 
 Discord Servers:
@@ -656,27 +829,39 @@ Best regards,
 • Don't only reach out when you need something
 """
 
-    return opportunities
-
-# =============================================================================
-# COMMUNICATION COACH AGENT TOOLS
-# =============================================================================
-
 @tool
-def generate_email_template(purpose: str, recipient: str) -> str:
+def networking_opportunities(interest: str) -> str:
     """
-    Use this tool when the user wants help writing any professional email or
-    message. This includes emails to professors, HR managers, college admin,
-    for leave applications, internship applications, or scholarship requests.
+    Use this tool when the user asks about networking, building professional
+    connections, finding communities, attending events, or meeting people in their field.
 
     Args:
-        purpose: What the email is for. Examples: query, leave, internship application,
-                 scholarship application, doubt, recommendation letter
-        recipient: Who is receiving the email. Examples: professor, HR, admin,
-                   scholarship committee
+        interest: Area of interest e.g. tech, business, design, research, finance
     """
-    templates = {
-        "professor_query": """
+    opportunities = f"""
+🤝 NETWORKING OPPORTUNITIES - {interest.upper()}
+
+📱 Online Communities to Join:
+
+LinkedIn Groups:
+• {interest} Professionals India
+• College to Corporate
+• First-Generation Professionals
+• Young Professionals Network
+
+WhatsApp/Telegram Communities:
+• College alumni groups
+• {interest} enthusiasts groups
+"""
+
+    return opportunities + _NETWORKING_GUIDE
+
+# =============================================================================
+# COMMUNICATION COACH AGENT TOOLS
+# =============================================================================
+
+_EMAIL_TEMPLATES = {
+    "professor_query": """
 📧 EMAIL TO PROFESSOR - DOUBT/QUERY
 
 Subject: Query Regarding [Topic/Subject Name] - [Your Name], [Class/Roll No]
@@ -712,7 +897,7 @@ Best regards,
 • Wait 2-3 days before follow-up
 • Use college email ID
 """,
-        "professor_leave": """
+    "professor_leave": """
 📧 EMAIL TO PROFESSOR - LEAVE APPLICATION
 
 Subject: Leave Application for [Dates] - [Your Name], [Roll No]
@@ -749,7 +934,7 @@ Attachment: [If any]
 • Keep it brief and honest
 • Follow college leave policy
 """,
-        "internship_application": """
+    "internship_application": """
 📧 EMAIL FOR INTERNSHIP APPLICATION
 
 Subject: Application for [Internship Position] - [Your Name], [College Name]
@@ -790,7 +975,7 @@ Attachments: Resume, Portfolio (if applicable)
 • Send during business hours
 • Follow up after 1 week
 """,
-        "admin_query": """
+    "admin_query": """
 📧 EMAIL TO COLLEGE ADMINISTRATION
 
 Subject: Query Regarding [Specific Issue] - [Your Name], [Roll No]
@@ -829,7 +1014,7 @@ Yours sincerely,
 • Be polite and patient
 • Visit office if no reply in 3-4 days
 """,
-        "scholarship_application": """
+    "scholarship_application": """
 📧 EMAIL FOR SCHOLARSHIP APPLICATION
 
 Subject: Application for [Scholarship Name] - [Your Name]
@@ -879,26 +1064,9 @@ Attachments: [List all attached documents]
 • Submit before deadline
 • Follow up on application status
 """
-    }
-
-    purpose_lower = purpose.lower()
-    recipient_lower = recipient.lower()
+}
 
-    # Improved matching logic
-    if "professor" in recipient_lower or "teacher" in recipient_lower or "faculty" in recipient_lower:
-        if any(w in purpose_lower for w in ["leave", "absent", "miss", "sick"]):
-            return templates["professor_leave"]
-        else:
-            return templates["professor_query"]
-    elif any(w in purpose_lower for w in ["internship", "job", "work", "hr", "company", "hiring"]):
-        return templates["internship_application"]
-    elif any(w in purpose_lower for w in ["scholarship", "financial", "aid", "stipend", "fee waiver"]):
-        return templates["scholarship_application"]
-    elif any(w in recipient_lower for w in ["admin", "office", "registrar", "department"]):
-        return templates["admin_query"]
-
-    # Default: show all options
-    return """
+_EMAIL_TEMPLATE_MENU = """
 📧 PROFESSIONAL EMAIL TEMPLATES AVAILABLE:
 
 I can help you write emails for:
@@ -927,19 +1095,45 @@ Please tell me:
 I'll generate the perfect template for you! 📝
 """
 
+# Keyword routing for generate_email_template, compiled once. Substring
+# matches (no word boundaries) so "professors" or "sick leave" still route.
+_PROFESSOR_RE = re.compile(r"professor|teacher|faculty", re.IGNORECASE)
+_LEAVE_RE = re.compile(r"leave|absent|miss|sick", re.IGNORECASE)
+_INTERNSHIP_RE = re.compile(r"internship|job|work|hr|company|hiring", re.IGNORECASE)
+_SCHOLARSHIP_RE = re.compile(r"scholarship|financial|aid|stipend|fee waiver", re.IGNORECASE)
+_ADMIN_RE = re.compile(r"admin|office|registrar|department", re.IGNORECASE)
+
 @tool
-def linkedin_profile_guide(section: str) -> str:
+def generate_email_template(purpose: str, recipient: str) -> str:
     """
-    Use this tool when the user asks about LinkedIn, building a professional
-    online presence, improving their profile, or how to present themselves
-    to recruiters and employers online.
+    Use this tool when the user wants help writing any professional email or
+    message. This includes emails to professors, HR managers, college admin,
+    for leave applications, internship applications, or scholarship requests.
 
     Args:
-        section: Which part of LinkedIn to help with. Examples: headline, summary,
-                 experience, skills, general, photo, connections, posts
+        purpose: What the email is for. Examples: query, leave, internship application,
+                 scholarship application, doubt, recommendation letter
+        recipient: Who is receiving the email. Examples: professor, HR, admin,
+                   scholarship committee
     """
-    guides = {
-        "headline": """
+    # Improved matching logic
+    if _PROFESSOR_RE.search(recipient):
+        if _LEAVE_RE.search(purpose):
+            return _EMAIL_TEMPLATES["professor_leave"]
+        else:
+            return _EMAIL_TEMPLATES["professor_query"]
+    elif _INTERNSHIP_RE.search(purpose):
+        return _EMAIL_TEMPLATES["internship_application"]
+    elif _SCHOLARSHIP_RE.search(purpose):
+        return _EMAIL_TEMPLATES["scholarship_application"]
+    elif _ADMIN_RE.search(recipient):
+        return _EMAIL_TEMPLATES["admin_query"]
+
+    # Default: show all options
+    return _EMAIL_TEMPLATE_MENU
+
+_LINKEDIN_GUIDES = {
+    "headline": """
 💼 LINKEDIN HEADLINE GUIDE
 
 Your headline appears everywhere on LinkedIn - make it count!
@@ -973,7 +1167,7 @@ Examples for Students:
 • Mention if actively looking for opportunities
 • Keep it under 120 characters
 """,
-        "summary": """
+    "summary": """
 📝 LINKEDIN SUMMARY/ABOUT GUIDE
 
 Your summary is your elevator pitch - make it compelling!
@@ -1003,7 +1197,7 @@ Paragraph 4 - Call to Action:
 • Add contact info at the end
 • Update every 6 months
 """,
-        "experience": """
+    "experience": """
 💼 LINKEDIN EXPERIENCE SECTION GUIDE
 
 Even without formal experience, you have valuable skills to showcase!
@@ -1050,14 +1244,9 @@ Skills: Leadership · Event Management · Technical Training
 • Listing duties instead of achievements
 • Grammar/spelling errors
 """
-    }
+}
 
-    section_lower = section.lower()
-    for key in guides:
-        if key in section_lower:
-            return guides[key]
-
-    return """
+_LINKEDIN_GUIDE_MENU = """
 💼 LINKEDIN PROFILE OPTIMIZATION GUIDE
 
 I can give detailed help for any of these sections:
@@ -1090,51 +1279,30 @@ Which section would you like detailed guidance on?
 (headline / summary / experience / skills)
 """
 
-# =============================================================================
-# LEARNING ROADMAP AGENT TOOL
-# =============================================================================
+_LINKEDIN_SECTION_RE = re.compile("|".join(_LINKEDIN_GUIDES), re.IGNORECASE)
 
 @tool
-def generate_learning_roadmap(topic: str, current_level: str = "beginner") -> str:
+def linkedin_profile_guide(section: str) -> str:
     """
-    Use this tool when the user wants to LEARN something new, asks for a
-    roadmap, study plan, or how to get started with any skill or subject.
-    This includes programming languages, frameworks, domains like data science,
-    or any career skill.
-
-    ALWAYS use this tool for requests like:
-    - "I want to learn [topic]"
-    - "How do I start with [topic]"
-    - "Teach me [topic]"
-    - "Roadmap for [topic]"
-    - "How to become a [role]"
+    Use this tool when the user asks about LinkedIn, building a professional
+    online presence, improving their profile, or how to present themselves
+    to recruiters and employers online.
 
     Args:
-        topic: The subject to learn e.g. Python, web development, data science,
-               machine learning, graphic design, digital marketing
-        current_level: beginner, intermediate, or advanced (default: beginner)
+        section: Which part of LinkedIn to help with. Examples: headline, summary,
+                 experience, skills, general, photo, connections, posts
     """
-    try:
-        query = f"complete learning roadmap {topic} {current_level} free resources 2025"
-
-        tavily_tool = TavilySearchResults(
-            max_results=7,
-            search_depth="advanced",
-            include_answer=True
-        )
+    match = _LINKEDIN_SECTION_RE.search(section)
+    if match:
+        return _LINKEDIN_GUIDES[match.group(0).lower()]
 
-        results = tavily_tool.invoke({"query": query})
+    return _LINKEDIN_GUIDE_MENU
 
-        roadmap = f"""
-📚 COMPLETE LEARNING ROADMAP: {topic.upper()}
-Level: {current_level.capitalize()}
-
-"""
-
-        topic_lower = topic.lower()
+# =============================================================================
+# LEARNING ROADMAP AGENT TOOL
+# =============================================================================
 
-        if any(w in topic_lower for w in ["web", "frontend", "front-end", "html", "css", "react"]):
-            roadmap += """
+_WEB_DEV_PATH = """
 🗺️ PHASE-WISE LEARNING PATH:
 
 📍 PHASE 1: Foundations (2-3 months)
@@ -1182,8 +1350,8 @@ Month 7: Advanced Concepts
 
 🎯 TOTAL TIMELINE: 6-9 months with daily practice
 """
-        elif any(w in topic_lower for w in ["python", "programming"]):
-            roadmap += """
+
+_PYTHON_PATH = """
 🗺️ PHASE-WISE LEARNING PATH:
 
 📍 PHASE 1: Python Basics (1-2 months)
@@ -1236,8 +1404,8 @@ Option C - Automation:
 
 🎯 TOTAL TIMELINE: 6-9 months to job-ready
 """
-        elif any(w in topic_lower for w in ["data science", "machine learning", "ml", "ai", "artificial intelligence"]):
-            roadmap += """
+
+_DATA_SCIENCE_PATH = """
 🗺️ PHASE-WISE LEARNING PATH:
 
 📍 PHASE 1: Foundations (2-3 months)
@@ -1299,9 +1467,8 @@ Choose one area:
 
 🎯 TOTAL TIMELINE: 10-12 months to job-ready
 """
-        else:
-            roadmap += f"""
-🗺️ LEARNING PATH FOR {topic.upper()}:
+
+_GENERAL_LEARNING_PATH = """
 
 📍 PHASE 1: Foundations (25% of journey)
 • Understand core concepts and terminology
@@ -1329,7 +1496,7 @@ Choose one area:
 
 """
 
-        roadmap += """
+_LEARNING_RESOURCES = """
 🔗 BEST FREE LEARNING RESOURCES:
 
 **📺 YouTube Channels (Free & Excellent):**
@@ -1365,16 +1532,7 @@ Choose one area:
 • Dev.to - Developer articles and blogs
 """
 
-        if results and isinstance(results, list):
-            roadmap += "\n**🔍 Current Resources Found Online:**\n\n"
-            for i, result in enumerate(results[:4], 1):
-                if isinstance(result, dict):
-                    title = result.get('title', 'Resource')
-                    content = result.get('content', '')
-                    url = result.get('url', '')
-                    roadmap += f"{i}. **{title}**\n   {content[:120]}...\n   🔗 {url}\n\n"
-
-        roadmap += """
+_LEARNING_SCHEDULE = """
 📅 SUGGESTED WEEKLY SCHEDULE:
 
 For Students (15-20 hrs/week):
@@ -1413,7 +1571,68 @@ Consistency is your superpower. 🚀
 Ask me about any specific phase, project ideas, or resources! 💬
 """
 
-        return roadmap
+@tool
+async def generate_learning_roadmap(topic: str, current_level: str = "beginner") -> str:
+    """
+    Use this tool when the user wants to LEARN something new, asks for a
+    roadmap, study plan, or how to get started with any skill or subject.
+    This includes programming languages, frameworks, domains like data science,
+    or any career skill.
+
+    ALWAYS use this tool for requests like:
+    - "I want to learn [topic]"
+    - "How do I start with [topic]"
+    - "Teach me [topic]"
+    - "Roadmap for [topic]"
+    - "How to become a [role]"
+
+    Args:
+        topic: The subject to learn e.g. Python, web development, data science,
+               machine learning, graphic design, digital marketing
+        current_level: beginner, intermediate, or advanced (default: beginner)
+    """
+    cache_key = _tool_cache_key("generate_learning_roadmap", topic, current_level)
+    cached = _tool_cache_get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        query = f"complete learning roadmap {topic} {current_level} free resources 2025"
+
+        # Deeper content is worth the latency for roadmap resources
+        tavily_tool = _get_tavily(4, search_depth="advanced")
+
+        results = await tavily_tool.ainvoke({"query": query})
+
+        parts = [f"""
+📚 COMPLETE LEARNING ROADMAP: {topic.upper()}
+Level: {current_level.capitalize()}
+
+"""]
+
+        topic_lower = topic.lower()
+
+        if any(w in topic_lower for w in ["web", "frontend", "front-end", "html", "css", "react"]):
+            parts.append(_WEB_DEV_PATH)
+        elif any(w in topic_lower for w in ["python", "programming"]):
+            parts.append(_PYTHON_PATH)
+        elif any(w in topic_lower for w in ["data science", "machine learning", "ml", "ai", "artificial intelligence"]):
+            parts.append(_DATA_SCIENCE_PATH)
+        else:
+            parts.append(f"\n🗺️ LEARNING PATH FOR {topic.upper()}:")
+            parts.append(_GENERAL_LEARNING_PATH)
+
+        parts.append(_LEARNING_RESOURCES)
+
+        found = _format_results(results, 4, "Resource", 120, "{i}. **{title}**\n   {snippet}...\n   🔗 {url}\n\n")
+
+        if found:
+            parts.append("\n**🔍 Current Resources Found Online:**\n\n")
+            parts.extend(found)
+
+        parts.append(_LEARNING_SCHEDULE)
+
+        return _search_tool_output(cache_key, parts, found)
 
     except Exception as e:
         return f"""
@@ -1439,44 +1658,46 @@ Ask me about any specific aspect of learning {topic}! 🎯
 """
 
 # =============================================================================
-# CREATE MULTI-AGENT SYSTEM
+# ASYNC RUNTIME
 # =============================================================================
 
-def create_agent():
-    """Initialize and return the AI mentor multi-agent system."""
+# The agent runs on one long-lived event loop shared by every caller. Async
+# HTTP clients keep their connection pools bound to the loop that opened them,
+# so a fresh asyncio.run() per turn would break them on the second turn.
+_LOOP = None
+_LOOP_LOCK = threading.Lock()
+
+def _get_loop():
+    """Return the shared agent event loop, starting it on first use."""
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, name="agent-loop", daemon=True).start()
+    return _LOOP
+
+def _run(coro):
+    """Run a coroutine on the shared agent loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
 
-    # FIX 1: Lower temperature for more precise, relevant answers
-    llm = ChatGroq(
-        model_name="llama-3.3-70b-versatile",
-        temperature=0.2,
-        max_tokens=2048,
-        timeout=60,
-        max_retries=2
-    )
-
-    tavily_tool = TavilySearchResults(
-        max_results=5,
-        search_depth="advanced",
-        include_answer=True,
-        include_raw_content=False
-    )
+# =============================================================================
+# CREATE MULTI-AGENT SYSTEM
+# =============================================================================
 
-    tools = [
-        get_current_datetime,
-        get_college_deadlines,
-        explain_college_process,
-        search_internships,
-        find_scholarships,
-        networking_opportunities,
-        generate_email_template,
-        linkedin_profile_guide,
-        generate_learning_roadmap,
-        tavily_tool
-    ]
-
-    # FIX 2: Much more precise system prompt with explicit tool routing rules
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are an AI Mentor for first-generation college students in India. You are warm, practical, and encouraging.
+_TOOLS = (
+    get_current_datetime,
+    get_college_deadlines,
+    explain_college_process,
+    search_internships,
+    find_scholarships,
+    networking_opportunities,
+    generate_email_template,
+    linkedin_profile_guide,
+    generate_learning_roadmap,
+)
+
+# FIX 2: Much more precise system prompt with explicit tool routing rules
+_SYSTEM_PROMPT = """You are an AI Mentor for first-generation college students in India. You are warm, practical, and encouraging.
 
 === CRITICAL TOOL USAGE RULES — FOLLOW THESE EXACTLY ===
 
@@ -1529,81 +1750,437 @@ You MUST call a tool before responding whenever the user's message matches these
 - Warm and encouraging, like a helpful senior student
 - Never condescending
 - Celebrate small wins and normalize asking for help
-- If a student seems stressed or confused, acknowledge that before giving information"""),
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("human", "{input}"),
-        MessagesPlaceholder(variable_name="agent_scratchpad"),
-    ])
+- If a student seems stressed or confused, acknowledge that before giving information"""
+
+# Compiled once per process and shared by every executor
+_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", _SYSTEM_PROMPT),
+    MessagesPlaceholder(variable_name="chat_history"),
+    ("human", "{input}"),
+    MessagesPlaceholder(variable_name="agent_scratchpad"),
+])
 
-    agent = create_tool_calling_agent(llm, tools, prompt)
+# Wall-clock limit on one agent run, in seconds
+MAX_EXECUTION_TIME = 90
+
+def create_agent():
+    """Initialize and return the AI mentor multi-agent system."""
+
+    # FIX 1: Lower temperature for more precise, relevant answers
+    llm = ChatGroq(
+        model_name="llama-3.3-70b-versatile",
+        temperature=0.2,
+        max_tokens=2048,
+        timeout=60,
+        max_retries=2,
+        streaming=True
+    )
+
+    # The generic web-search tool is added here: building it needs TAVILY_API_KEY
+    tools = [*_TOOLS, _get_tavily(5)]
+
+    agent = create_tool_calling_agent(llm, tools, _PROMPT)
 
     # FIX 3: Tighter iteration limits to prevent wandering
     agent_executor = AgentExecutor(
         agent=agent,
         tools=tools,
-        verbose=True,
+        verbose=AGENT_VERBOSE,
+        callbacks=[],
         handle_parsing_errors=True,
         max_iterations=5,
-        max_execution_time=90,
-        return_intermediate_steps=False
+        max_execution_time=MAX_EXECUTION_TIME,
+        # Lets batch callers see which tools ran (see _uses_live_tools)
+        return_intermediate_steps=True
     )
 
     return agent_executor
 
-def chat(user_input: str, agent_executor):
-    """Process user input and maintain chat history."""
-    global chat_history
-
+# Max prompts chat_batch() runs at once (AGENT_BATCH_CONCURRENCY env var);
+# keep it under the Groq rate limit for your plan
+BATCH_CONCURRENCY = int(os.getenv("AGENT_BATCH_CONCURRENCY", "10"))
+
+# Request coalescing for shared deployments: questions arriving from different
+# sessions within this many milliseconds go to the LLM as one batch. 0 = off.
+COALESCE_WINDOW_MS = int(os.getenv("AGENT_COALESCE_WINDOW_MS", "0"))
+COALESCE_MAX_BATCH = int(os.getenv("AGENT_COALESCE_MAX_BATCH", "8"))
+
+# Shared executor for callers that don't build their own; created on first use
+_AGENT_EXECUTOR = None
+_AGENT_LOCK = threading.Lock()
+
+def _get_agent():
+    """Return the shared agent executor, creating it once."""
+    global _AGENT_EXECUTOR
+    with _AGENT_LOCK:
+        if _AGENT_EXECUTOR is None:
+            _AGENT_EXECUTOR = create_agent()
+    return _AGENT_EXECUTOR
+
+def _extract_output(response) -> str:
+    """Pull the final answer text out of an executor response."""
+    # FIX 5: Cleaner output extraction
+    if isinstance(response, dict):
+        return response.get("output", "").strip()
+    elif hasattr(response, "output"):
+        return str(response.output).strip()
+    return str(response).strip()
+
+# Answers that used these tools are only right at the moment they were given
+_UNCACHEABLE_TOOLS = {"get_current_datetime"}
+
+def _uses_live_tools(response) -> bool:
+    """Whether an executor response called any of _UNCACHEABLE_TOOLS."""
+    steps = response.get("intermediate_steps", ()) if isinstance(response, dict) else ()
+    return any(action.tool in _UNCACHEABLE_TOOLS for action, _ in steps)
+
+_STREAM_END = object()
+
+async def _pump_events(agent_executor, inputs: dict, events: asyncio.Queue):
+    """Feed the executor's stream events into `events`, ending with _STREAM_END."""
     try:
-        if chat_history is None:
-            chat_history = []
-
-        # FIX 4: Robust chat history conversion with validation
-        formatted_history = []
-        for msg in chat_history:
-            if not (isinstance(msg, tuple) and len(msg) == 2):
-                continue
-            role, content = msg
-            if not isinstance(content, str) or not content.strip():
-                continue
-            if role == "human":
-                formatted_history.append(HumanMessage(content=content))
-            elif role == "assistant":
-                formatted_history.append(AIMessage(content=content))
-
-        if agent_executor is None:
-            agent_executor = create_agent()
-
-        response = agent_executor.invoke({
-            "input": user_input,
-            "chat_history": formatted_history
-        })
-
-        # FIX 5: Cleaner output extraction
-        if isinstance(response, dict):
-            output = response.get("output", "").strip()
-        elif hasattr(response, "output"):
-            output = str(response.output).strip()
-        else:
-            output = str(response).strip()
+        async for event in agent_executor.astream_events(inputs, version="v2"):
+            events.put_nowait(event)
+    finally:
+        events.put_nowait(_STREAM_END)
 
-        if not output:
-            output = "I'm here to help! Could you rephrase your question?"
+_ROLE_MESSAGES = {"user": HumanMessage, "assistant": AIMessage, "system": SystemMessage}
 
-        # Save to history only if we got a real response
-        chat_history.append(("human", user_input))
-        chat_history.append(("assistant", output))
+def _history_messages(history) -> list:
+    """Turn {"role", "content"} dicts (as the app stores them) into chat messages."""
+    return [_ROLE_MESSAGES.get(m.get("role"), AIMessage)(content=m.get("content", "")) for m in history]
 
-        # Keep history bounded to last 10 exchanges (20 messages)
-        if len(chat_history) > 20:
-            chat_history = chat_history[-20:]
-
-        return output
+async def chat_stream(user_input: str, agent_executor=None, history=None) -> AsyncIterator[str]:
+    """
+    Stream the mentor's answer as it is generated.
+    Yields text chunks as the LLM produces them; chat history and the
+    response cache are updated once the answer is complete.
+
+    `history` is an optional list of {"role", "content"} dicts to use as the
+    conversation so far (e.g. a session's recent messages). Callers passing it
+    keep their own history; without it the module-level chat_history is used.
+    Only first turns are cached: an answer that depends on earlier messages
+    or on the current date must not be served for a later question.
+    """
+    if agent_executor is None:
+        agent_executor = _get_agent()
+
+    prior = list(chat_history) if history is None else _history_messages(history)
+    cacheable = not prior
+
+    # A verbatim repeat is a dict lookup: answer it without starting the agent
+    cached = response_cache.lookup_exact(user_input) if cacheable else None
+    if cached is not None:
+        yield cached
+        return
+
+    # Otherwise start the agent straight away and look for a paraphrase while
+    # it runs, so a miss doesn't add the embedding time to the answer.
+    # Events are buffered until the cache has missed; a hit cancels the run.
+    # The async executor runs all tool calls of one LLM turn concurrently
+    # (asyncio.gather), so multi-tool turns wait for the slowest search only
+    events = asyncio.Queue()
+    agent_task = asyncio.create_task(_pump_events(
+        agent_executor,
+        {"input": user_input, "chat_history": prior},
+        events
+    ))
+    try:
+        cached = await asyncio.to_thread(response_cache.lookup_similar, user_input) if cacheable else None
+        if cached is not None:
+            agent_task.cancel()
+            yield cached
+            return
+
+        streamed = []
+        final_output = ""
+        while (event := await events.get()) is not _STREAM_END:
+            if event["event"] == "on_chat_model_stream":
+                token = event["data"]["chunk"].content
+                if token:
+                    streamed.append(token)
+                    yield token
+            elif event["event"] == "on_tool_start" and event["name"] in _UNCACHEABLE_TOOLS:
+                cacheable = False
+            elif event["event"] == "on_chain_end" and not event.get("parent_ids"):
+                final_output = _extract_output(event["data"]["output"])
+        # Surface any error the run ended with
+        await agent_task
+    finally:
+        agent_task.cancel()
+
+    # History and the cache get the executor's final answer: the streamed
+    # tokens also include any text the model emitted alongside tool calls
+    streamed_output = "".join(streamed).strip()
+    output = final_output or streamed_output
+    if output and cacheable:
+        response_cache.add(user_input, output)
+    if not streamed_output:
+        # Nothing streamed (e.g. the executor stopped at its iteration limit):
+        # show the executor's own final answer
+        output = output or "I'm here to help! Could you rephrase your question?"
+        yield output
+
+    # Save to history only if we got a real response
+    if history is None:
+        chat_history.append(HumanMessage(content=user_input))
+        chat_history.append(AIMessage(content=output))
+
+async def _collect(stream) -> str:
+    return "".join([chunk async for chunk in stream]).strip()
+
+def chat(user_input: str, agent_executor=None, history=None):
+    """Process user input and maintain chat history."""
+    try:
+        return _run(_collect(chat_stream(user_input, agent_executor, history)))
 
     except Exception as e:
         print(f"Chat error: {str(e)}")
         return "I ran into a technical issue. Could you please try asking again?"
 
+async def _prefetch(prompts, agent_executor):
+    # Answer the prompts in one batch and pin the answers in the response
+    # cache; failed prompts are simply left for a live answer later
+    responses = await agent_executor.abatch(
+        [{"input": text, "chat_history": []} for text in prompts],
+        config={"max_concurrency": BATCH_CONCURRENCY},
+        return_exceptions=True
+    )
+    for text, response in zip(prompts, responses):
+        if isinstance(response, Exception):
+            print(f"Warm-up: prefetch failed for {text!r} ({response})")
+            continue
+        output = _extract_output(response)
+        if output and not _uses_live_tools(response):
+            response_cache.add(text, output, pinned=True)
+
+def _warm_up(agent_executor, prefetch):
+    # Each step is best-effort: a failure here only means a slower first answer
+    try:
+        response_cache.warm()
+    except Exception as e:
+        print(f"Warm-up: embedding model not loaded ({e})")
+    try:
+        # Opens a pooled TLS connection to Tavily; no search credits are used
+        _SEARCH_SESSION.head(TAVILY_API_URL, timeout=5)
+    except Exception as e:
+        print(f"Warm-up: Tavily unreachable ({e})")
+    try:
+        # A tiny real turn on the shared loop opens the Groq connection that
+        # later turns reuse
+        _run(agent_executor.ainvoke({"input": "hi", "chat_history": []}))
+    except Exception as e:
+        print(f"Warm-up: agent call failed ({e})")
+    try:
+        # Skip prompts already answered (e.g. loaded from the disk cache)
+        missing = [text for text in prefetch if response_cache.lookup(text) is None]
+        if missing:
+            _run(_prefetch(missing, agent_executor))
+    except Exception as e:
+        print(f"Warm-up: prefetch failed ({e})")
+
+def start_warmup(agent_executor=None, prefetch=()):
+    """
+    Warm the slow first-use paths in a background thread: the embedding
+    model, the Tavily connection pool and the LLM client's connection.
+    Answers to the `prefetch` prompts (e.g. the app's quick actions) are then
+    computed and pinned in the response cache, so those questions hit at once.
+    """
+    if agent_executor is None:
+        agent_executor = _get_agent()
+    threading.Thread(
+        target=_warm_up, args=(agent_executor, list(prefetch)), name="agent-warmup", daemon=True
+    ).start()
+
+def chat_stream_sync(user_input: str, agent_executor=None, history=None) -> Iterator[str]:
+    """
+    Blocking generator over chat_stream() for synchronous callers (Streamlit).
+    Chunks are handed over from the shared agent loop as soon as they arrive.
+    """
+    chunks = queue.Queue()
+
+    async def pump():
+        try:
+            async for chunk in chat_stream(user_input, agent_executor, history):
+                chunks.put(chunk)
+        except Exception as e:
+            print(f"Chat error: {str(e)}")
+            chunks.put("I ran into a technical issue. Could you please try asking again?")
+        finally:
+            chunks.put(_STREAM_END)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), _get_loop())
+    try:
+        while (chunk := chunks.get()) is not _STREAM_END:
+            yield chunk
+    finally:
+        # Consumer stopped early: stop generating instead of finishing unseen
+        future.cancel()
+
+async def _abatch(inputs, histories, agent_executor):
+    # Raw executor responses (or exceptions) in input order; histories are
+    # {"role", "content"} lists as accepted by chat_stream(), or None
+    if agent_executor is None:
+        agent_executor = _get_agent()
+    histories = histories or [None] * len(inputs)
+    return await agent_executor.abatch(
+        [{"input": text, "chat_history": _history_messages(history or [])}
+         for text, history in zip(inputs, histories)],
+        config={"max_concurrency": BATCH_CONCURRENCY},
+        return_exceptions=True
+    )
+
+_ERROR_REPLY = "I ran into a technical issue. Could you please try asking again?"
+
+def _batch_output(response) -> str:
+    if isinstance(response, Exception):
+        print(f"Chat error: {str(response)}")
+        return _ERROR_REPLY
+    return _extract_output(response) or "I'm here to help! Could you rephrase your question?"
+
+async def chat_batch_async(inputs: list[str], agent_executor=None, histories=None) -> list[str]:
+    """
+    Answer independent prompts concurrently (e.g. scripted evaluations).
+    Each prompt runs with its entry in `histories` (empty by default) and does
+    not touch the shared chat history; answers come back in input order.
+    """
+    return [_batch_output(response) for response in await _abatch(inputs, histories, agent_executor)]
+
+def chat_batch(inputs: list[str], agent_executor=None, histories=None) -> list[str]:
+    """Blocking wrapper around chat_batch_async()."""
+    return _run(chat_batch_async(inputs, agent_executor, histories))
+
+class BatchDispatcher:
+    """
+    Coalesces questions submitted from many threads into batched agent calls.
+    The first question opens a `window`-second collection window; everything
+    that arrives before it closes (up to `max_batch`) is answered with one
+    batched agent call. Answers are not streamed; each question runs with the
+    history it was submitted with, and the response cache is used under the
+    same rules as chat_stream(). A question not answered within `timeout`
+    seconds (by default one agent run plus the window) gets the error reply.
+    """
+
+    def __init__(self, agent_executor=None, window=COALESCE_WINDOW_MS / 1000,
+                 max_batch=COALESCE_MAX_BATCH, timeout=None):
+        self.agent_executor = agent_executor
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout if timeout is not None else MAX_EXECUTION_TIME + window + 5
+        self._loop = _get_loop()
+        self._queue = asyncio.Queue()
+        self._inflight = set()  # strong refs so running batches aren't garbage collected
+        self._start_collector()
+
+    def _start_collector(self):
+        self._collector = asyncio.run_coroutine_threadsafe(self._collect_loop(), self._loop)
+        self._collector.add_done_callback(self._collector_done)
+
+    def _collector_done(self, collector):
+        # The loop only ends on an error; without it every submit() would time out
+        if collector.cancelled():
+            return
+        print(f"Batch dispatcher: collector stopped ({collector.exception()!r}), restarting")
+        # After a pause, so a collector that keeps failing doesn't spin
+        self._loop.call_soon_threadsafe(self._loop.call_later, 1, self._start_collector)
+
+    def submit(self, user_input: str, history=None) -> str:
+        """Queue a question (with optional {"role", "content"} history) and block until its answer is ready."""
+        future = concurrent.futures.Future()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (user_input, history or [], future))
+        try:
+            return future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            print(f"Chat error: no answer from the batch dispatcher within {self.timeout:g}s")
+            return _ERROR_REPLY
+
+    async def _collect_loop(self):
+        # One pending get() is carried across windows rather than cancelled on
+        # timeout: cancelling wait_for(queue.get()) can drop an item on Python < 3.12
+        getter = None
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(self._queue.get())
+            items = [await getter]
+            getter = None
+            deadline = self._loop.time() + self.window
+            while len(items) < self.max_batch:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                getter = asyncio.ensure_future(self._queue.get())
+                done, _ = await asyncio.wait({getter}, timeout=timeout)
+                if not done:
+                    break
+                items.append(getter.result())
+                getter = None
+            # Dispatch in the background so the next window opens right away
+            task = asyncio.create_task(self._dispatch(items))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, items):
+        try:
+            # Repeated first-turn questions are still answered from the response cache
+            cached = await asyncio.gather(*(
+                asyncio.to_thread(response_cache.lookup, text) if not history else asyncio.sleep(0)
+                for text, history, _ in items
+            ))
+            misses = [(text, history) for (text, history, _), hit in zip(items, cached) if hit is None]
+            responses = iter(await _abatch(
+                [text for text, _ in misses], [history for _, history in misses], self.agent_executor
+            ) if misses else [])
+            for (text, history, future), hit in zip(items, cached):
+                if hit is not None:
+                    future.set_result(hit)
+                    continue
+                response = next(responses)
+                output = _batch_output(response)
+                answered = not isinstance(response, Exception) and _extract_output(response)
+                if answered and not history and not _uses_live_tools(response):
+                    response_cache.add(text, output)
+                future.set_result(output)
+        except Exception as e:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+
+# =============================================================================
+# HISTORY SUMMARIZATION
+# =============================================================================
+
+# Older turns of a long conversation are folded into one short summary so the
+# prompt stays a fixed size. A small, fast model is plenty for this.
+_SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Summarize this conversation between a first-generation college student and their mentor "
+               "in at most 5 short sentences. Keep the student's goals, field, year, location, and any "
+               "open questions or commitments; drop greetings and generic advice."),
+    ("human", "{conversation}"),
+])
+
+@functools.lru_cache(maxsize=None)
+def _get_summarizer():
+    llm = ChatGroq(
+        model_name="llama-3.1-8b-instant",
+        temperature=0,
+        max_tokens=256,
+        timeout=30,
+        max_retries=2
+    )
+    return _SUMMARY_PROMPT | llm
+
+async def _summarize(history) -> str:
+    conversation = "\n".join(f"{m.get('role', 'user')}: {m.get('content', '')}" for m in history)
+    result = await _get_summarizer().ainvoke({"conversation": conversation})
+    return result.content.strip()
+
+def summarize_history(history) -> concurrent.futures.Future:
+    """
+    Start summarizing `history` ({"role", "content"} dicts) in the background.
+    Returns a future that resolves to the summary text.
+    """
+    return asyncio.run_coroutine_threadsafe(_summarize(list(history)), _get_loop())
+
 
 if __name__ == "__main__":
     print("=" * 70)
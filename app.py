@@ -4,22 +4,42 @@ Beautiful UI with comprehensive mentoring capabilities
 """
 
 import streamlit as st
+import html
+import logging
+import os
 import uuid
 import time
 import traceback
+from pathlib import Path
 from typing import List, Dict
-import streamlit.components.v1 as components
+
+logger = logging.getLogger(__name__)
 
 # === Import agent utilities ===
 try:
-    from agent import create_agent, chat as agent_chat
+    from agent import (
+        create_agent, start_warmup, chat_stream_sync as agent_chat_stream, summarize_history,
+        BatchDispatcher, COALESCE_WINDOW_MS
+    )
 except Exception as imp_err:
     create_agent = None
-    agent_chat = None
+    start_warmup = None
+    agent_chat_stream = None
+    summarize_history = None
+    BatchDispatcher = None
+    COALESCE_WINDOW_MS = 0
     IMPORT_ERROR = imp_err
 else:
     IMPORT_ERROR = None
 
+try:
+    from cache_store import pop_session, save_session, session_token, session_id_from_token
+except Exception:
+    pop_session = lambda session_id: None
+    save_session = lambda session_id, messages: None
+    session_token = lambda session_id: session_id
+    session_id_from_token = lambda token: None
+
 # === Page config and CSS ===
 st.set_page_config(
     page_title="🎓 AI Mentor - First-Gen Students",
@@ -28,200 +48,96 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-st.markdown(
-    """
-    <style>
-    /* Layout */
-    .app-container { max-width: 1200px; margin: 10px auto; }
-    .header { display:flex; justify-content:space-between; align-items:center; margin-bottom:15px; }
-    .title { font-size:28px; font-weight:700; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); -webkit-background-clip: text; -webkit-text-fill-color: transparent; }
-    .subtitle { color:#7b8794; font-size:14px; margin-top:5px; }
-
-    /* Chatbox */
-    #chatbox {
-        border-radius: 16px;
-        padding: 24px;
-        background: linear-gradient(180deg, rgba(255,255,255,0.02), rgba(255,255,255,0.04));
-        box-shadow: 0 10px 40px rgba(2,6,23,0.08);
-        max-height: 65vh;
-        overflow-y: auto;
-        margin-bottom: 20px;
-    }
-
-    /* Message bubbles */
-    .msg-user {
-        margin-left:auto;
-        margin-bottom:16px;
-        padding:14px 18px;
-        border-radius:18px;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        max-width:75%;
-        box-shadow: 0 8px 24px rgba(102,126,234,0.25);
-        word-wrap:break-word;
-        font-size: 15px;
-    }
-    
-    .msg-assistant {
-        margin-right:auto;
-        margin-bottom:16px;
-        padding:14px 18px;
-        border-radius:18px;
-        background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
-        color: #2d3748;
-        max-width:75%;
-        box-shadow: 0 8px 24px rgba(0,0,0,0.08);
-        word-wrap:break-word;
-        font-size: 15px;
-        line-height: 1.6;
-    }
-    
-    .meta {
-        font-size:11px;
-        color: rgba(255,255,255,0.7);
-        margin-top:8px;
-        font-weight: 500;
-    }
-    
-    .meta-assistant {
-        font-size:11px;
-        color: #718096;
-        margin-top:8px;
-        font-weight: 500;
-    }
-
-    /* Quick actions */
-    .quick-actions {
-        display: flex;
-        gap: 10px;
-        margin-bottom: 15px;
-        flex-wrap: wrap;
-    }
-
-    /* Feature cards */
-    .feature-grid {
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-        gap: 15px;
-        margin: 20px 0;
-    }
-    
-    .feature-card {
-        background: white;
-        border-radius: 12px;
-        padding: 20px;
-        box-shadow: 0 4px 12px rgba(0,0,0,0.08);
-        border-left: 4px solid #667eea;
-        transition: transform 0.2s;
-    }
-    
-    .feature-card:hover {
-        transform: translateY(-2px);
-    }
-    
-    .feature-icon {
-        font-size: 32px;
-        margin-bottom: 10px;
-    }
-    
-    .feature-title {
-        font-size: 16px;
-        font-weight: 600;
-        color: #2d3748;
-        margin-bottom: 8px;
-    }
-    
-    .feature-desc {
-        font-size: 13px;
-        color: #718096;
-        line-height: 1.5;
-    }
-
-    /* Input area */
-    .input-container {
-        background: white;
-        border-radius: 16px;
-        padding: 20px;
-        box-shadow: 0 10px 40px rgba(2,6,23,0.08);
-        margin-top: 20px;
-    }
-
-    /* Status badges */
-    .status-badge {
-        display: inline-block;
-        padding: 6px 14px;
-        border-radius: 20px;
-        font-size: 12px;
-        font-weight: 600;
-        margin-bottom: 10px;
-    }
-    
-    .status-ready {
-        background: linear-gradient(135deg, #84fab0 0%, #8fd3f4 100%);
-        color: #047857;
-    }
-    
-    .status-loading {
-        background: linear-gradient(135deg, #ffeaa7 0%, #fdcb6e 100%);
-        color: #92400e;
-    }
-
-    /* Responsive */
-    @media (max-width: 800px) {
-        #chatbox { max-height: 55vh; padding:16px; }
-        .msg-user, .msg-assistant { max-width:90%; }
-        .title { font-size: 24px; }
-    }
-    
-    /* Scrollbar styling */
-    #chatbox::-webkit-scrollbar {
-        width: 8px;
-    }
-    
-    #chatbox::-webkit-scrollbar-track {
-        background: rgba(0,0,0,0.05);
-        border-radius: 10px;
-    }
-    
-    #chatbox::-webkit-scrollbar-thumb {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        border-radius: 10px;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
+# Styles live in static/style.css; read once per process and reused on every rerun
+@st.cache_resource(show_spinner=False)
+def _css():
+    return (Path(__file__).parent / "static" / "style.css").read_text(encoding="utf-8")
+
+st.markdown(f"<style>{_css()}</style>", unsafe_allow_html=True)
+
+# Quick actions: button label -> the question it asks. Their answers are
+# prefetched at startup, so these common first questions answer instantly.
+QUERY_MAP = {
+    "📚 Learn Python": "I want to learn Python programming from scratch. Can you give me a complete roadmap?",
+    "💼 Find Internships": "Help me find internships in software engineering",
+    "✉️ Draft Email": "Help me draft an email to a professor for research opportunity",
+    "📅 Track Deadlines": "What are the important academic deadlines I should track?",
+}
 
 # === Cached agent initializer ===
 @st.cache_resource(show_spinner=False)
 def get_agent_executor_cached():
     if create_agent is None:
         raise RuntimeError(f"agent.create_agent import failed: {IMPORT_ERROR}")
-    return create_agent()
+    agent_exec = create_agent()
+    # Once per process: get connections and models hot before the first question
+    start_warmup(agent_exec, prefetch=QUERY_MAP.values())
+    return agent_exec
+
+@st.cache_resource(show_spinner=False)
+def get_dispatcher():
+    """Shared request-coalescing dispatcher, or None when AGENT_COALESCE_WINDOW_MS is 0."""
+    if BatchDispatcher is None or COALESCE_WINDOW_MS <= 0:
+        return None
+    return BatchDispatcher(get_agent_executor_cached())
 
 def ensure_agent_ready():
     if st.session_state.get("agent_ready") and st.session_state.get("agent_executor"):
         return st.session_state["agent_executor"]
     agent_exec = get_agent_executor_cached()
-    st.session_state["agent_executor"] = agent_exec
-    st.session_state["agent_ready"] = True
+    st.session_state.setdefault("agent_executor", agent_exec)
+    if not st.session_state.get("agent_ready"):
+        st.session_state.agent_ready = True
     return agent_exec
 
+# Conversation window: the agent sees the last HISTORY_WINDOW messages verbatim;
+# once a chat passes SUMMARIZE_AFTER messages, everything older is folded into
+# one summary message in the background
+HISTORY_WINDOW = 10
+SUMMARIZE_AFTER = 20
+
+def recent_history(messages):
+    """The messages to send the agent: the summary (if any) plus the recent window."""
+    window = messages[-HISTORY_WINDOW:]
+    if messages and messages[0]["role"] == "system" and (not window or window[0] is not messages[0]):
+        window = [messages[0]] + window
+    return window
+
 # === Session state init ===
+# A server-signed token for the session lives in the URL (?sid=...), so a
+# reload or reconnect resumes the conversation. Ids are never taken from the
+# client unsigned, and a resumed conversation moves to a fresh id: an old or
+# planted link can't be used to read what is typed afterwards
 if "session_id" not in st.session_state:
+    resumed = session_id_from_token(st.query_params.get("sid"))
     st.session_state.session_id = str(uuid.uuid4())
-
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-
-if "agent_ready" not in st.session_state:
-    st.session_state.agent_ready = False
-
-if "last_error" not in st.session_state:
-    st.session_state.last_error = None
-
-if "show_features" not in st.session_state:
-    st.session_state.show_features = True
+    st.session_state.messages = (pop_session(resumed) if resumed else None) or []
+    if st.session_state.messages:
+        save_session(st.session_state.session_id, st.session_state.messages)
+    st.query_params["sid"] = session_token(st.session_state.session_id)
+
+DEFAULTS = {
+    "agent_ready": False,
+    "last_error": None,
+    "show_features": True,
+    "summary_job": None,
+    # MENTOR_DEBUG=1 on the server shows full tracebacks in the page
+    "debug": os.getenv("MENTOR_DEBUG", "0") == "1",
+}
+for key, value in DEFAULTS.items():
+    st.session_state.setdefault(key, value)
+
+# Fold in a finished background summary: it replaces the messages it covers
+if st.session_state.summary_job is not None and st.session_state.summary_job[0].done():
+    future, count = st.session_state.summary_job
+    st.session_state.summary_job = None
+    try:
+        summary = future.result()
+    except Exception:
+        summary = ""  # keep the full messages; a later turn will try again
+    if summary:
+        st.session_state.messages[:count] = [{"role": "system", "content": f"Summary: {summary}", "ts": time.time()}]
+        save_session(st.session_state.session_id, st.session_state.messages)
 
 # === Header ===
 st.markdown('<div class="app-container">', unsafe_allow_html=True)
@@ -240,11 +156,19 @@ with col1:
         unsafe_allow_html=True
     )
 
+def _clear_chat():
+    st.session_state.messages = []
+    st.session_state.summary_job = None
+    st.session_state.show_features = True
+    save_session(st.session_state.session_id, [])
+
 with col2:
+    # Escape the session id before it goes into raw HTML
     st.markdown(
-        f"<div style='text-align:right; color:#718096; font-size:11px; margin-top:10px;'>Session: {st.session_state.session_id[:8]}</div>",
+        f"<div style='text-align:right; color:#718096; font-size:11px; margin-top:10px;'>Session: {html.escape(st.session_state.session_id[:8])}</div>",
         unsafe_allow_html=True
     )
+    st.button("🗑️ Clear", use_container_width=True, on_click=_clear_chat)
 
 st.markdown("<hr style='margin: 15px 0; border: none; border-top: 2px solid #e2e8f0;'>", unsafe_allow_html=True)
 
@@ -282,206 +206,147 @@ if st.session_state.show_features and len(st.session_state.messages) == 0:
     """, unsafe_allow_html=True)
 
 # === Quick action examples ===
-st.markdown("<div style='font-size:14px; font-weight:600; color:#4a5568; margin-bottom:10px;'>Quick Actions:</div>", unsafe_allow_html=True)
-
-col_a, col_b, col_c, col_d = st.columns(4)
-
-with col_a:
-    if st.button("📚 Learn Python", use_container_width=True):
-        st.session_state.quick_query = "I want to learn Python programming from scratch. Can you give me a complete roadmap?"
-        st.session_state.show_features = False
-
-with col_b:
-    if st.button("💼 Find Internships", use_container_width=True):
-        st.session_state.quick_query = "Help me find internships in software engineering"
-        st.session_state.show_features = False
+def _on_quick_action():
+    # Queue the question for this rerun, then clear the selection so the same action can be picked again
+    st.session_state.quick_query = QUERY_MAP[st.session_state.quick_action]
+    st.session_state.show_features = False
+    st.session_state.quick_action = None
 
-with col_c:
-    if st.button("✉️ Draft Email", use_container_width=True):
-        st.session_state.quick_query = "Help me draft an email to a professor for research opportunity"
-        st.session_state.show_features = False
+st.markdown("<div style='font-size:14px; font-weight:600; color:#4a5568; margin-bottom:10px;'>Quick Actions:</div>", unsafe_allow_html=True)
 
-with col_d:
-    if st.button("📅 Track Deadlines", use_container_width=True):
-        st.session_state.quick_query = "What are the important academic deadlines I should track?"
-        st.session_state.show_features = False
+st.radio(
+    "Quick actions",
+    list(QUERY_MAP),
+    index=None,
+    horizontal=True,
+    key="quick_action",
+    on_change=_on_quick_action,
+    label_visibility="collapsed",
+)
 
 st.markdown("</div>", unsafe_allow_html=True)
 
-# === Main chat container ===
-chatbox_placeholder = st.empty()
-
+# === Chat ===
 # Initialize agent lazily
 if not st.session_state.agent_ready:
     try:
         with st.spinner("🔄 Initializing AI Mentor..."):
             ensure_agent_ready()
-            st.session_state.agent_ready = True
             st.rerun()
-    except Exception:
-        st.session_state.last_error = traceback.format_exc()
-        st.error("❌ Mentor initialization failed. Check your API keys in .env file.")
-        chat_html = "<div id='chatbox'><div style='color:#e53e3e; padding:20px; text-align:center;'>AI Mentor initialization failed. Please check your GROQ_API_KEY and TAVILY_API_KEY in .env file.</div></div>"
-        chatbox_placeholder.markdown(chat_html, unsafe_allow_html=True)
+    except Exception as e:
+        logger.exception("Mentor initialization failed")
+        st.session_state.last_error = f"{type(e).__name__}: {e}"[:200]
+        st.error("❌ AI Mentor initialization failed. Please check your GROQ_API_KEY and TAVILY_API_KEY in .env file.")
         st.markdown("</div>", unsafe_allow_html=True)
         st.stop()
 
-# Function to render chat HTML
-def render_chat_html(messages):
-    if not messages:
-        html_parts = [
-            "<div id='chatbox'>",
-            "<div style='text-align:center; padding:60px 20px; color:#718096;'>",
-            "<div style='font-size:48px; margin-bottom:20px;'>🎓</div>",
-            "<div style='font-size:18px; font-weight:600; margin-bottom:10px;'>Welcome to Your AI Mentor!</div>",
-            "<div style='font-size:14px;'>I'm here to guide you through college, career planning, and learning new skills.</div>",
-            "<div style='font-size:13px; margin-top:15px; color:#a0aec0;'>Ask me anything - from finding internships to learning a new programming language!</div>",
-            "</div>",
-            "</div>"
-        ]
-        return "\n".join(html_parts)
-    
-    html_parts = ["<div id='chatbox'>"]
-    for msg in messages:
-        role = msg.get("role", "user")
-        content = msg.get("content", "")
-        ts = msg.get("ts", time.time())
-        ts_str = time.strftime("%H:%M", time.localtime(ts))
-        
-        # Convert newlines to <br> and preserve formatting
-        safe_content = content.replace("\n", "<br>")
-        
-        if role == "user":
-            html_parts.append(
-                f"<div style='display:flex; justify-content:flex-end;'>"
-                f"<div class='msg-user'>{safe_content}"
-                f"<div class='meta'>You • {ts_str}</div></div></div>"
-            )
-        else:
-            html_parts.append(
-                f"<div style='display:flex; justify-content:flex-start;'>"
-                f"<div class='msg-assistant'>{safe_content}"
-                f"<div class='meta-assistant'>AI Mentor • {ts_str}</div></div></div>"
-            )
-    html_parts.append("</div>")
-    return "\n".join(html_parts)
-
-# Render current messages
-chatbox_placeholder.markdown(render_chat_html(st.session_state.messages), unsafe_allow_html=True)
+AVATARS = {"user": "🧑‍🎓", "assistant": "🎓"}
+# st.write_stream redraws the whole answer per chunk, so tokens are grouped
+STREAM_FLUSH_SECONDS = 0.1
+
+def _clear_on_first_chunk(chunks, placeholder):
+    """Yield `chunks`, clearing `placeholder` (the thinking note) when the first arrives."""
+    for chunk in chunks:
+        if placeholder is not None:
+            placeholder.empty()
+            placeholder = None
+        yield chunk
+
+def _coalesce_chunks(chunks, interval=STREAM_FLUSH_SECONDS):
+    """Group `chunks` into pieces of at most ~`interval` seconds, flushing early at sentence ends."""
+    buffer = []
+    last = time.monotonic()
+    for chunk in chunks:
+        buffer.append(chunk)
+        if time.monotonic() - last > interval or chunk.endswith((".", "!", "?", "\n")):
+            yield "".join(buffer)
+            buffer = []
+            last = time.monotonic()
+    if buffer:
+        yield "".join(buffer)
+
+# Render the conversation with native chat elements; a history summary is
+# shown as a small caption rather than a bubble
+if not st.session_state.messages:
+    with st.chat_message("assistant", avatar=AVATARS["assistant"]):
+        st.markdown(
+            "**Welcome to Your AI Mentor!**\n\n"
+            "I'm here to guide you through college, career planning, and learning new skills. "
+            "Ask me anything - from finding internships to learning a new programming language!"
+        )
 
-# === Input area ===
-st.markdown("<div class='input-container'>", unsafe_allow_html=True)
+for msg in st.session_state.messages:
+    if msg["role"] == "system":
+        st.caption(f"📝 {msg['content']}")
+        continue
+    with st.chat_message(msg["role"], avatar=AVATARS.get(msg["role"])):
+        st.markdown(msg["content"])
 
-# Handle quick query if set
-quick_query = st.session_state.get("quick_query", "")
-if quick_query:
-    default_text = quick_query
+# === Input area ===
+# A quick action submits its question directly
+prompt = st.chat_input("Ask your AI Mentor... e.g. 'Help me find internships in marketing'")
+if not prompt and st.session_state.get("quick_query"):
+    prompt = st.session_state.quick_query
     st.session_state.quick_query = ""
-else:
-    default_text = ""
-
-with st.form("chat_form", clear_on_submit=True):
-    user_input = st.text_area(
-        "Ask your AI Mentor:",
-        key="user_input_field",
-        height=100,
-        placeholder="Examples:\n• 'I want to learn Data Science from scratch'\n• 'Help me find internships in marketing'\n• 'Draft an email to request a recommendation letter'\n• 'Explain the course registration process'\n• 'How can I optimize my LinkedIn profile?'",
-        value=default_text
-    )
-    
-    col_send, col_clear = st.columns([4, 1])
-    with col_send:
-        submit = st.form_submit_button("🚀 Ask Mentor", use_container_width=True, type="primary")
-    with col_clear:
-        clear = st.form_submit_button("🗑️ Clear", use_container_width=True)
-
-st.markdown("</div>", unsafe_allow_html=True)
-
-# Handle clear
-if clear:
-    st.session_state.messages = []
-    st.session_state.show_features = True
-    chatbox_placeholder.markdown(render_chat_html([]), unsafe_allow_html=True)
-    st.rerun()
 
 # Handle submit
-if submit and user_input and user_input.strip():
-    text = user_input.strip()
-    st.session_state.show_features = False
-    
-    # Add user message
+if prompt and prompt.strip():
+    text = prompt.strip()
+    if st.session_state.show_features:
+        st.session_state.show_features = False
+    history = recent_history(st.session_state.messages)
+
     st.session_state.messages.append({"role": "user", "content": text, "ts": time.time()})
-    chatbox_placeholder.markdown(render_chat_html(st.session_state.messages), unsafe_allow_html=True)
-    
-    # Add thinking placeholder
-    st.session_state.messages.append({"role": "assistant", "content": "🤔 Thinking and gathering the best guidance for you...", "ts": time.time()})
-    chatbox_placeholder.markdown(render_chat_html(st.session_state.messages), unsafe_allow_html=True)
-    
-    try:
-        agent_exec = st.session_state.get("agent_executor") or ensure_agent_ready()
-        start = time.time()
-        
-        # Call agent
+    with st.chat_message("user", avatar=AVATARS["user"]):
+        st.markdown(text)
+
+    with st.chat_message("assistant", avatar=AVATARS["assistant"]):
+        thinking = st.empty()
+        thinking.markdown("🤔 Thinking and gathering the best guidance for you...")
         try:
-            response = agent_chat(text, agent_exec)
-            if response is None:
-                response = "I'm here to help! Could you please provide more details about what you need assistance with?"
-            elif not isinstance(response, str):
-                response = str(response)
+            agent_exec = st.session_state.get("agent_executor") or ensure_agent_ready()
+            start = time.time()
+
+            try:
+                dispatcher = get_dispatcher()
+                if dispatcher is not None:
+                    # Shared deployment: batched with other sessions' questions
+                    response = dispatcher.submit(text, history)
+                    thinking.markdown(response)
+                else:
+                    # st.write_stream renders the answer incrementally as it is generated
+                    response = st.write_stream(_clear_on_first_chunk(_coalesce_chunks(agent_chat_stream(text, agent_exec, history)), thinking))
+                if not response or not response.strip():
+                    response = "I'm here to help! Could you please provide more details about what you need assistance with?"
+                    thinking.markdown(response)
+            except Exception as e:
+                response = f"I encountered a small hiccup: {str(e)}. Please try rephrasing your question, and I'll do my best to help!"
+                thinking.markdown(response)
+
+            st.session_state.messages.append({"role": "assistant", "content": response, "ts": time.time()})
+            elapsed = time.time() - start
+            save_session(st.session_state.session_id, st.session_state.messages)
+
+            # Summarize everything but the recent window once the chat gets long
+            messages = st.session_state.messages
+            if len(messages) > SUMMARIZE_AFTER and st.session_state.summary_job is None and summarize_history is not None:
+                count = len(messages) - HISTORY_WINDOW
+                st.session_state.summary_job = (summarize_history(messages[:count]), count)
+
+            st.caption(f"⚡ Response time: {elapsed:.2f}s")
+
         except Exception as e:
-            response = f"I encountered a small hiccup: {str(e)}. Please try rephrasing your question, and I'll do my best to help!"
-        
-        # Update last assistant message
-        for i in range(len(st.session_state.messages) - 1, -1, -1):
-            if st.session_state.messages[i]["role"] == "assistant":
-                st.session_state.messages[i]["content"] = response
-                st.session_state.messages[i]["ts"] = time.time()
-                break
-        
-        chatbox_placeholder.markdown(render_chat_html(st.session_state.messages), unsafe_allow_html=True)
-        elapsed = time.time() - start
-        
-        st.markdown(
-            f"<div style='text-align:right; color:#a0aec0; font-size:12px; margin-top:10px;'>⚡ Response time: {elapsed:.2f}s</div>",
-            unsafe_allow_html=True
-        )
-        
-    except Exception:
-        tb = traceback.format_exc()
-        st.session_state.last_error = tb
-        
-        for i in range(len(st.session_state.messages) - 1, -1, -1):
-            if st.session_state.messages[i]["role"] == "assistant":
-                st.session_state.messages[i]["content"] = "⚠️ I encountered a technical issue. Please check your API keys and try again."
-                st.session_state.messages[i]["ts"] = time.time()
-                break
-        
-        chatbox_placeholder.markdown(render_chat_html(st.session_state.messages), unsafe_allow_html=True)
-        
-        with st.expander("🔍 Error Details"):
-            st.code(tb)
-    
-    # Auto-scroll to bottom
-    components.html(
-        """
-        <script>
-        const cb = document.getElementById('chatbox');
-        if (cb) { cb.scrollTop = cb.scrollHeight; }
-        </script>
-        """,
-        height=0,
-    )
+            # Full traceback goes to the server log; the session keeps a short summary
+            logger.exception("Agent error")
+            st.session_state.last_error = f"{type(e).__name__}: {e}"[:200]
 
-# Initial scroll
-components.html(
-    """
-    <script>
-    const cb = document.getElementById('chatbox');
-    if (cb) { cb.scrollTop = cb.scrollHeight; }
-    </script>
-    """,
-    height=0,
-)
+            response = "⚠️ I encountered a technical issue. Please check your API keys and try again."
+            st.session_state.messages.append({"role": "assistant", "content": response, "ts": time.time()})
+            thinking.markdown(response)
+
+            if st.session_state.debug:
+                with st.expander("🔍 Error Details"):
+                    st.code(traceback.format_exc())
 
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -0,0 +1,88 @@
+"""
+Persistent storage for the AI Mentor
+Keeps cached answers and chat sessions on disk so they survive restarts
+and are shared by every worker process
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+
+try:
+    import diskcache
+except ImportError:
+    # Optional dependency: without it nothing is persisted
+    diskcache = None
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".mentor_cache")
+SESSION_TTL = 7 * 24 * 60 * 60
+
+# One SQLite-backed store for both kinds of records; keys are namespaced tuples
+# (("response", <sha256>), ("session", <session id>)). Least recently used
+# records are culled once it passes 512 MB.
+store = None
+if diskcache is not None:
+    try:
+        store = diskcache.Cache(
+            STORE_DIR,
+            size_limit=512 * 1024 * 1024,
+            eviction_policy="least-recently-used"
+        )
+    except Exception as e:
+        # e.g. a read-only app directory or a locked/corrupt database: nothing is persisted
+        print(f"Persistent store disabled ({e})")
+
+
+_secret = None
+
+def _session_secret():
+    """Key for signing session tokens: MENTOR_SESSION_SECRET, else one shared through the store."""
+    global _secret
+    if _secret is None:
+        configured = os.getenv("MENTOR_SESSION_SECRET")
+        if configured:
+            _secret = configured.encode("utf-8")
+        elif store is not None:
+            # add() only writes if absent, so concurrent workers agree on one key
+            store.add(("secret", "session"), secrets.token_hex(32))
+            _secret = (store.get(("secret", "session")) or secrets.token_hex(32)).encode("utf-8")
+        else:
+            _secret = secrets.token_bytes(32)
+    return _secret
+
+
+def session_token(session_id):
+    """The signed form of a session id that may be handed to the browser."""
+    signature = hmac.new(_session_secret(), session_id.encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{session_id}.{signature}"
+
+
+def session_id_from_token(token):
+    """Return the session id of a token made by session_token(), or None if it doesn't verify."""
+    session_id, _, signature = (token or "").rpartition(".")
+    if not session_id or not hmac.compare_digest(session_token(session_id), token):
+        return None
+    return session_id
+
+
+def load_session(session_id):
+    """Return the saved messages of a chat session, or None."""
+    if store is None:
+        return None
+    return store.get(("session", session_id))
+
+
+def pop_session(session_id):
+    """Return the saved messages of a chat session and delete them, or None."""
+    if store is None:
+        return None
+    return store.pop(("session", session_id), None)
+
+
+def save_session(session_id, messages):
+    """Save a chat session's messages (role, content and time only)."""
+    if store is None:
+        return
+    saved = [{"role": m["role"], "content": m["content"], "ts": m.get("ts")} for m in messages]
+    store.set(("session", session_id), saved, expire=SESSION_TTL)
@@ -0,0 +1,210 @@
+"""
+Semantic response cache for the AI Mentor
+Returns an earlier answer when a new question is a close paraphrase of an old one
+"""
+
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    # Optional dependency: without it the cache never hits
+    np = None
+    SentenceTransformer = None
+
+
+class SemanticCache:
+    """
+    In-memory (embedding -> response) cache with LRU + TTL eviction.
+    A sha256 of the normalized question is checked first, so verbatim repeats
+    hit without computing an embedding (and even without sentence-transformers).
+
+    With a `store` (a diskcache.Cache), every entry is also written to disk
+    and the cache starts warm with the unexpired entries saved there.
+    Pinned entries (e.g. prefetched answers) are never evicted for space.
+    """
+
+    def __init__(self, threshold=0.92, ttl=3600, max_entries=500,
+                 model_name="sentence-transformers/all-MiniLM-L6-v2", store=None):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.model_name = model_name
+        self._model = None
+        self._model_failed = False     # set once loading or encoding fails; only exact matches are served after that
+        self._model_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # id -> {"query", "response", "ts", "hits", "pinned", "emb", "key"}, oldest first
+        self._exact = {}               # sha256 of normalized query -> id
+        self._next_id = 0
+        self._matrix = None            # stacked embeddings, rebuilt lazily after writes
+        self._matrix_ids = []
+        self._embed = functools.lru_cache(maxsize=256)(self._encode)
+        self._store = store
+        if store is not None:
+            self._load()
+
+    @property
+    def enabled(self):
+        return SentenceTransformer is not None and not self._model_failed
+
+    @staticmethod
+    def _key(query):
+        normalized = " ".join(query.lower().split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        """Fill the cache from the unexpired entries in the store, oldest first."""
+        now = time.time()
+        records = []
+        for store_key in list(self._store):
+            if not (isinstance(store_key, tuple) and store_key[0] == "response"):
+                continue
+            record = self._store.get(store_key)
+            if record is not None and now - record["ts"] <= self.ttl:
+                records.append((store_key[1], record))
+
+        for key, record in sorted(records, key=lambda item: item[1]["ts"]):
+            # Without numpy the embedding can't be used: keep the entry for exact hits only
+            emb = np.frombuffer(record["emb"], dtype=np.float32) if record["emb"] is not None and np is not None else None
+            self._entries[self._next_id] = {
+                "query": record["query"], "response": record["response"], "ts": record["ts"],
+                "hits": record["hits"], "pinned": record.get("pinned", False), "emb": emb, "key": key
+            }
+            self._exact[key] = self._next_id
+            self._next_id += 1
+        self._evict(now)
+
+    def _save(self, entry):
+        """Write an entry to the store; it expires there when it would here."""
+        if self._store is None:
+            return
+        emb = entry["emb"]
+        record = {
+            "query": entry["query"], "response": entry["response"], "ts": entry["ts"],
+            "hits": entry["hits"], "pinned": entry["pinned"],
+            "emb": emb.astype(np.float32).tobytes() if np is not None and isinstance(emb, np.ndarray) else None
+        }
+        self._store.set(("response", entry["key"]), record, expire=max(self.ttl - (time.time() - entry["ts"]), 1))
+
+    def warm(self):
+        """Load the embedding model now instead of on the first lookup."""
+        if self.enabled:
+            self._embed("hello")
+
+    def _encode(self, text):
+        """Embed `text`, or return None once the model has failed to load or run."""
+        if self._model_failed:
+            return None
+        try:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = SentenceTransformer(self.model_name)
+            return self._model.encode(text, normalize_embeddings=True)
+        except Exception as e:
+            # e.g. no network to download the model: fall back to the exact tier for good
+            self._model_failed = True
+            print(f"Semantic cache: embedding disabled ({e})")
+            return None
+
+    def _evict(self, now):
+        """Drop expired entries, then the least recently used unpinned ones over the limit."""
+        expired = [i for i, e in self._entries.items() if now - e["ts"] > self.ttl]
+        overflow = len(self._entries) - len(expired) - self.max_entries
+        if overflow > 0:
+            expired += [i for i, e in self._entries.items() if not e["pinned"] and i not in expired][:overflow]
+        for i in expired:
+            self._drop(i, self._entries.pop(i))
+        if expired:
+            self._matrix = None
+
+    def _drop(self, entry_id, entry):
+        if self._exact.get(entry["key"]) == entry_id:
+            del self._exact[entry["key"]]
+
+    def lookup(self, query):
+        """Return the cached response for `query` or a paraphrase of it, or None."""
+        cached = self.lookup_exact(query)
+        if cached is not None:
+            return cached
+        return self.lookup_similar(query)
+
+    def lookup_exact(self, query):
+        """Return the cached response for a verbatim repeat of `query`, or None. Never embeds."""
+        if not query.strip():
+            return None
+
+        with self._lock:
+            self._evict(time.time())
+            entry_id = self._exact.get(self._key(query))
+            if entry_id is not None:
+                return self._hit(entry_id)
+        return None
+
+    def lookup_similar(self, query):
+        """Return the cached response for the closest paraphrase of `query`, or None."""
+        if not query.strip() or not self.enabled:
+            return None
+        emb = self._embed(query)
+        if emb is None:
+            return None
+
+        with self._lock:
+            self._evict(time.time())
+            if not self._entries:
+                return None
+            if self._matrix is None:
+                # Entries saved while sentence-transformers was missing have no embedding
+                self._matrix_ids = [i for i, e in self._entries.items() if e["emb"] is not None]
+                if not self._matrix_ids:
+                    return None
+                self._matrix = np.stack([self._entries[i]["emb"] for i in self._matrix_ids])
+
+            # Embeddings are unit length, so one matrix-vector product gives all cosine scores
+            scores = self._matrix @ emb
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            return self._hit(self._matrix_ids[best])
+
+    def _hit(self, entry_id):
+        entry = self._entries[entry_id]
+        entry["hits"] += 1
+        self._entries.move_to_end(entry_id)
+        self._save(entry)
+        return entry["response"]
+
+    def add(self, query, response, pinned=False):
+        """Store `response` as the answer for `query`; pinned entries skip LRU eviction."""
+        if not query.strip():
+            return
+        key = self._key(query)
+        emb = self._embed(query) if self.enabled else None
+
+        with self._lock:
+            previous = self._exact.get(key)
+            if previous is not None:
+                del self._entries[previous]
+            entry = {"query": query, "response": response, "ts": time.time(), "hits": 0, "pinned": pinned, "emb": emb, "key": key}
+            self._entries[self._next_id] = entry
+            self._exact[key] = self._next_id
+            self._next_id += 1
+            self._matrix = None
+            self._evict(time.time())
+            self._save(entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._exact.clear()
+            self._matrix = None
+            if self._store is not None:
+                for store_key in list(self._store):
+                    if isinstance(store_key, tuple) and store_key[0] == "response":
+                        self._store.delete(store_key)